@@ -4,15 +4,40 @@ Extracts license information and metadata from ArXiv papers in iSearch dataset.
 """
 
 import csv
+import gzip
 import time
 import requests
 import re
 import os
-from bs4 import BeautifulSoup
+import threading
+import lxml.html
+from lxml import etree
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 from typing import List, Tuple, Optional, Dict, Any
 from urllib.parse import urljoin
 
 
+# ArXiv paper ID patterns, tried in order
+_ARXIV_PATTERNS = [
+    re.compile(r"arxiv\.org/(?:abs|pdf)/([\d\.]+[a-z]*(?:v\d+)?)"),
+    re.compile(r"arxiv\.org/([\d\.]+[a-z]*(?:v\d+)?)"),
+]
+_DIGITS_RE = re.compile(r'\d+')
+_VERSION_BRACKET_RE = re.compile(r'\[v(\d+)\]')
+_VERSION_RE = re.compile(r'v(\d+)')
+_FN_SAFE_TABLE = str.maketrans({c: '_' for c in '<>:"/\\|?*'})
+# Pages are handed to lxml as UTF-8 bytes, so their encoding is never guessed
+_UTF8_HTML_PARSER = lxml.html.HTMLParser(encoding='utf-8')
+
+
+def _has_class(class_name: str) -> str:
+    """Build an XPath predicate matching elements that carry the given CSS class."""
+    return f'contains(concat(" ", normalize-space(@class), " "), " {class_name} ")'
+
+
 class ArXivMetadataExtractor:
     """Extracts and processes metadata from ArXiv abstract pages."""
     
@@ -26,6 +51,8 @@ class ArXivMetadataExtractor:
     # Processing parameters
     REQUEST_DELAY = 0.5
     REQUEST_TIMEOUT = 15
+    MAX_CONCURRENT_REQUESTS = 4
+    SAVE_WORKERS = 2
     CHECKPOINT_INTERVAL = 50
     
     # Document ID range to process
@@ -41,6 +68,9 @@ class ArXivMetadataExtractor:
         "arxiv.org/licenses/assumed-1991-2003": "arXiv Assumed (1991-2003)",
     }
     
+    # Matches any LICENSE_MAPPINGS key in a single regex pass
+    LICENSE_PATTERN = re.compile("|".join(map(re.escape, LICENSE_MAPPINGS)))
+    
     HEADERS = {
         "User-Agent": "Academic-Research-Bot/1.0 (contact: researcher@institution.edu)"
     }
@@ -50,9 +80,36 @@ class ArXivMetadataExtractor:
         "title", "authors", "comments", "subjects", "journal_ref", "related_doi"
     ]
 
+    # Precompiled XPath queries for the fields read from abstract pages
+    LICENSE_LINK_XPATH = etree.XPath('//a[@rel="license" or contains(@href, "/licenses/")]')
+    HISTORY_TEXT_XPATH = etree.XPath(f'string((//div[{_has_class("submission-history")}])[1])')
+    OG_URL_XPATH = etree.XPath('//meta[@property="og:url"]/@content')
+    TITLE_XPATH = etree.XPath(f'(//h1[{_has_class("title")}])[1]//text()')
+    AUTHORS_XPATH = etree.XPath(f'(//div[{_has_class("authors")}])[1]//a')
+    COMMENTS_XPATH = etree.XPath(f'(//td[{_has_class("comments")}])[1]//text()')
+    SUBJECTS_XPATH = etree.XPath(f'(//td[{_has_class("subjects")}])[1]//text()')
+    JREF_XPATH = etree.XPath(f'(//td[{_has_class("jref")}])[1]//text()')
+    DOI_XPATH = etree.XPath(f'((//td[{_has_class("doi")}])[1]//a)[1]//text()')
+    TEXT_XPATH = etree.XPath('.//text()')
+
     def __init__(self):
         """Initialize the extractor and ensure required directories exist."""
         os.makedirs(self.ABSTRACT_FOLDER, exist_ok=True)
+        
+        # Reuse keep-alive connections to arxiv.org across requests
+        self._session = requests.Session()
+        self._session.headers.update(self.HEADERS)
+        retries = Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504))
+        self._session.mount("https://", HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.MAX_CONCURRENT_REQUESTS,
+            max_retries=retries,
+        ))
+        
+        # Request slots shared by all fetch workers, so REQUEST_DELAY spaces
+        # requests globally rather than per worker
+        self._slot_lock = threading.Lock()
+        self._next_slot = 0.0
 
     def normalize_arxiv_url(self, url: str) -> Optional[str]:
         """Convert various ArXiv URL formats to standard abstract page URL."""
@@ -63,13 +120,8 @@ class ArXivMetadataExtractor:
         url = url.replace('.pdf', '').strip()
         
         # Extract paper ID from common ArXiv URL patterns
-        patterns = [
-            r"arxiv\.org/(?:abs|pdf)/([\d\.]+[a-z]*(?:v\d+)?)",
-            r"arxiv\.org/([\d\.]+[a-z]*(?:v\d+)?)",
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, url)
+        for pattern in _ARXIV_PATTERNS:
+            match = pattern.search(url)
             if match:
                 paper_id = match.group(1)
                 return f"https://arxiv.org/abs/{paper_id}"
@@ -92,7 +144,7 @@ class ArXivMetadataExtractor:
             pass
             
         # Extract numbers from mixed-format IDs
-        numbers = re.findall(r'\d+', doc_id)
+        numbers = _DIGITS_RE.findall(doc_id)
         if numbers:
             try:
                 return int(numbers[-1])
@@ -106,40 +158,54 @@ class ArXivMetadataExtractor:
         if not license_url:
             return "Unknown"
             
-        license_url = license_url.lower().strip()
-        
-        for url_pattern, license_name in self.LICENSE_MAPPINGS.items():
-            if url_pattern in license_url:
-                return license_name
+        match = self.LICENSE_PATTERN.search(license_url.lower().strip())
+        if match:
+            return self.LICENSE_MAPPINGS[match.group(0)]
                 
         return "Other/Unmapped"
 
-    def extract_metadata(self, html_content: str) -> Dict[str, Any]:
-        """Extract all metadata fields from ArXiv abstract page HTML."""
-        soup = BeautifulSoup(html_content, "html.parser")
+    def extract_metadata(self, html_content: str) -> Optional[Dict[str, Any]]:
+        """Extract all metadata fields from ArXiv abstract page HTML, or None if it is empty."""
+        try:
+            # Parse bytes: lxml refuses str input that carries an XML encoding declaration
+            tree = lxml.html.fromstring(html_content.encode('utf-8'), parser=_UTF8_HTML_PARSER)
+        except etree.ParserError as e:
+            # Whitespace-only bodies have no document to parse
+            print(f"Failed to parse abstract page: {e}")
+            return None
         
         return {
-            "license_url": self._extract_license_url(soup),
-            "version": self._extract_version(soup),
-            "title": self._extract_title(soup),
-            "authors": self._extract_authors(soup),
-            "comments": self._extract_comments(soup),
-            "subjects": self._extract_subjects(soup),
-            "journal_ref": self._extract_journal_ref(soup),
-            "related_doi": self._extract_doi(soup),
+            "license_url": self._extract_license_url(tree, html_content),
+            "version": self._extract_version(tree),
+            "title": self._extract_title(tree),
+            "authors": self._extract_authors(tree),
+            "comments": self._extract_comments(tree),
+            "subjects": self._extract_subjects(tree),
+            "journal_ref": self._extract_journal_ref(tree),
+            "related_doi": self._extract_doi(tree),
         }
 
-    def _extract_license_url(self, soup: BeautifulSoup) -> Optional[str]:
+    def _extract_license_url(self, tree: lxml.html.HtmlElement,
+                             html_content: str) -> Optional[str]:
         """Extract license URL from page."""
+        # Skip the tree walk when the raw page has neither kind of license link
+        if "/licenses/" not in html_content and 'rel="license"' not in html_content:
+            return None
+        
+        # Collect every candidate anchor in one walk over the tree
+        license_links = self.LICENSE_LINK_XPATH(tree)
+        
         # Try rel=license attribute first
-        license_link = soup.select_one('a[rel="license"]')
-        if license_link and license_link.get("href"):
-            return self._normalize_url(license_link["href"])
+        for link in license_links:
+            href = link.get("href")
+            if link.get("rel") == "license" and href:
+                return self._normalize_url(href)
             
         # Fallback: search for licenses in links
-        for link in soup.find_all("a", href=True):
-            if "/licenses/" in link["href"]:
-                return self._normalize_url(link["href"])
+        for link in license_links:
+            href = link.get("href")
+            if href and "/licenses/" in href:
+                return self._normalize_url(href)
                 
         return None
 
@@ -151,86 +217,94 @@ class ArXivMetadataExtractor:
             return "https://arxiv.org" + url
         return url
 
-    def _extract_version(self, soup: BeautifulSoup) -> str:
+    def _join_text(self, fragments: List[str], separator: str = "") -> str:
+        """Join stripped text nodes, like BeautifulSoup's get_text(strip=True)."""
+        stripped = (fragment.strip() for fragment in fragments)
+        return separator.join(fragment for fragment in stripped if fragment)
+
+    def _extract_version(self, tree: lxml.html.HtmlElement) -> str:
         """Extract latest version number from submission history."""
-        history = soup.find("div", class_="submission-history")
-        if history:
-            versions = re.findall(r'\[v(\d+)\]', history.get_text())
-            if versions:
-                return f"v{max(versions, key=int)}"
+        history_text = self.HISTORY_TEXT_XPATH(tree)
+        if history_text:
+            latest = -1
+            for match in _VERSION_BRACKET_RE.finditer(history_text):
+                version = int(match.group(1))
+                if version > latest:
+                    latest = version
+            if latest >= 0:
+                return f"v{latest}"
                 
         # Fallback: check meta tag
-        meta_url = soup.find("meta", property="og:url")
-        if meta_url and meta_url.get("content"):
-            version_match = re.search(r'v(\d+)', meta_url["content"])
+        meta_urls = self.OG_URL_XPATH(tree)
+        if meta_urls:
+            version_match = _VERSION_RE.search(meta_urls[0])
             if version_match:
                 return f"v{version_match.group(1)}"
                 
         return ""
 
-    def _extract_title(self, soup: BeautifulSoup) -> str:
+    def _extract_title(self, tree: lxml.html.HtmlElement) -> str:
         """Extract paper title."""
-        title_tag = soup.select_one("h1.title")
-        if title_tag:
-            title = title_tag.get_text(strip=True)
-            # Remove "Title:" prefix if present
-            if title.lower().startswith("title:"):
-                title = title[6:].strip()
-            return title
-        return ""
+        title = self._join_text(self.TITLE_XPATH(tree))
+        # Remove "Title:" prefix if present
+        if title.lower().startswith("title:"):
+            title = title[6:].strip()
+        return title
 
-    def _extract_authors(self, soup: BeautifulSoup) -> str:
+    def _extract_authors(self, tree: lxml.html.HtmlElement) -> str:
         """Extract author names as comma-separated string."""
-        authors_div = soup.find("div", class_="authors")
-        if authors_div:
-            authors = [a.get_text(strip=True) for a in authors_div.find_all("a")]
-            return ", ".join(authors)
-        return ""
+        authors = [self._join_text(self.TEXT_XPATH(a)) for a in self.AUTHORS_XPATH(tree)]
+        return ", ".join(authors)
 
-    def _extract_comments(self, soup: BeautifulSoup) -> str:
+    def _extract_comments(self, tree: lxml.html.HtmlElement) -> str:
         """Extract comments field."""
-        comments_td = soup.find("td", class_="comments")
-        return comments_td.get_text(strip=True) if comments_td else ""
+        return self._join_text(self.COMMENTS_XPATH(tree))
 
-    def _extract_subjects(self, soup: BeautifulSoup) -> str:
+    def _extract_subjects(self, tree: lxml.html.HtmlElement) -> str:
         """Extract subject categories."""
-        subjects_td = soup.find("td", class_="subjects")
-        return subjects_td.get_text(" ", strip=True) if subjects_td else ""
+        return self._join_text(self.SUBJECTS_XPATH(tree), " ")
 
-    def _extract_journal_ref(self, soup: BeautifulSoup) -> str:
+    def _extract_journal_ref(self, tree: lxml.html.HtmlElement) -> str:
         """Extract journal reference."""
-        jref_td = soup.find("td", class_="jref")
-        return jref_td.get_text(strip=True) if jref_td else ""
+        return self._join_text(self.JREF_XPATH(tree))
 
-    def _extract_doi(self, soup: BeautifulSoup) -> str:
+    def _extract_doi(self, tree: lxml.html.HtmlElement) -> str:
         """Extract related DOI."""
-        doi_td = soup.find("td", class_="doi")
-        if doi_td:
-            doi_link = doi_td.find("a")
-            return doi_link.get_text(strip=True) if doi_link else ""
-        return ""
+        return self._join_text(self.DOI_XPATH(tree))
 
     def fetch_abstract_page(self, url: str) -> Optional[str]:
         """Download and return abstract page HTML content."""
         try:
-            response = requests.get(
-                url, 
-                headers=self.HEADERS, 
-                timeout=self.REQUEST_TIMEOUT
-            )
+            response = self._session.get(url, timeout=self.REQUEST_TIMEOUT)
             response.raise_for_status()
             return response.text
         except requests.RequestException as e:
             print(f"Failed to fetch {url}: {e}")
             return None
 
+    def _fetch_document(self, raw_url: str) -> Tuple[Optional[str], Optional[str]]:
+        """Normalize a document URL and download its page, pacing requests by REQUEST_DELAY."""
+        abs_url = self.normalize_arxiv_url(raw_url)
+        if not abs_url:
+            return None, None
+            
+        # Reserve the next free slot; requests still overlap, but start REQUEST_DELAY apart
+        with self._slot_lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.REQUEST_DELAY
+        if slot > now:
+            time.sleep(slot - now)
+        
+        return abs_url, self.fetch_abstract_page(abs_url)
+
     def save_abstract_page(self, html_content: str, doc_id: str) -> bool:
-        """Save abstract page HTML to file."""
+        """Save abstract page HTML to a gzip-compressed file."""
         try:
-            safe_filename = re.sub(r'[<>:"/\\|?*]', '_', doc_id)
-            filepath = os.path.join(self.ABSTRACT_FOLDER, f"{safe_filename}.html")
+            safe_filename = doc_id.translate(_FN_SAFE_TABLE)
+            filepath = os.path.join(self.ABSTRACT_FOLDER, f"{safe_filename}.html.gz")
             
-            with open(filepath, 'w', encoding='utf-8') as f:
+            with gzip.open(filepath, 'wt', encoding='utf-8', compresslevel=3) as f:
                 f.write(html_content)
             return True
         except Exception as e:
@@ -241,26 +315,37 @@ class ArXivMetadataExtractor:
         """Load and filter documents based on ID range."""
         documents = []
         
-        with open(self.INPUT_PATH, "r", encoding='utf-8') as file:
+        # Hoist per-row attribute lookups out of the loop
+        doc_id_column, url_column = self.DOC_ID_COLUMN, self.ABSTRACT_URL_COLUMN
+        min_row_length = max(doc_id_column, url_column) + 1
+        start_id, end_id = self.START_DOC_ID, self.END_DOC_ID
+        
+        with open(self.INPUT_PATH, "r", newline='', encoding='utf-8',
+                  buffering=1 << 20) as file:
             reader = csv.reader(file, delimiter="\t")
             
             for row in reader:
-                if len(row) <= max(self.DOC_ID_COLUMN, self.ABSTRACT_URL_COLUMN):
+                if len(row) < min_row_length:
                     continue
                     
-                doc_id = row[self.DOC_ID_COLUMN].strip()
-                abs_url = row[self.ABSTRACT_URL_COLUMN].strip()
+                doc_id = row[doc_id_column].strip()
+                abs_url = row[url_column].strip()
                 
                 if not abs_url:
                     continue
+                
+                # Fast path for PN0-prefixed IDs; odd formats use the full parser
+                id_digits = doc_id[3:]
+                if doc_id.startswith("PN0") and id_digits.isdecimal():
+                    numeric_id = int(id_digits)
+                else:
+                    numeric_id = self.extract_numeric_id(doc_id)
                     
-                numeric_id = self.extract_numeric_id(doc_id)
-                if (numeric_id is not None and 
-                    self.START_DOC_ID <= numeric_id <= self.END_DOC_ID):
+                if numeric_id is not None and start_id <= numeric_id <= end_id:
                     documents.append((doc_id, abs_url, numeric_id))
         
         # Sort by numeric ID for consistent processing
-        documents.sort(key=lambda x: x[2])
+        documents.sort(key=itemgetter(2))
         return documents
 
     def create_result_row(self, doc_id: str, abs_url: str, 
@@ -275,18 +360,6 @@ class ArXivMetadataExtractor:
             metadata["subjects"], metadata["journal_ref"], metadata["related_doi"]
         )
 
-    def save_results(self, results: List[Tuple], checkpoint_name: str = "") -> None:
-        """Save results to CSV file."""
-        file_exists = os.path.exists(self.OUTPUT_CSV_PATH)
-        
-        with open(self.OUTPUT_CSV_PATH, 'a', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            
-            if not file_exists:
-                writer.writerow(self.CSV_COLUMNS)
-            
-            writer.writerows(results)
-
     def process_documents(self) -> Dict[str, int]:
         """Main processing loop for documents."""
         documents = self.load_documents_to_process()
@@ -300,36 +373,46 @@ class ArXivMetadataExtractor:
         results = []
         stats = {"processed": 0, "successful": 0}
         
-        for i, (doc_id, raw_url, numeric_id) in enumerate(documents, 1):
-            abs_url = self.normalize_arxiv_url(raw_url)
-            
-            if not abs_url:
-                results.append(self._create_empty_result(doc_id, raw_url))
-                continue
-                
-            html_content = self.fetch_abstract_page(abs_url)
+        # Keep the output CSV open for the whole run; checkpoints only flush it
+        with open(self.OUTPUT_CSV_PATH, 'a', newline='', encoding='utf-8',
+                  buffering=1 << 20) as output_file, \
+                ThreadPoolExecutor(max_workers=self.MAX_CONCURRENT_REQUESTS) as pool, \
+                ThreadPoolExecutor(max_workers=self.SAVE_WORKERS) as io_pool:
+            writer = csv.writer(output_file)
+            if os.path.getsize(self.OUTPUT_CSV_PATH) == 0:
+                writer.writerow(self.CSV_COLUMNS)
             
-            if html_content:
-                metadata = self.extract_metadata(html_content)
-                self.save_abstract_page(html_content, doc_id)
-                results.append(self.create_result_row(doc_id, abs_url, metadata))
-                stats["successful"] += 1
-            else:
-                results.append(self._create_empty_result(doc_id, abs_url))
+            # Fetch one checkpoint interval at a time to bound pages held in memory
+            for start in range(0, len(documents), self.CHECKPOINT_INTERVAL):
+                batch = documents[start:start + self.CHECKPOINT_INTERVAL]
+                pages = pool.map(self._fetch_document, [raw_url for _, raw_url, _ in batch])
                 
-            stats["processed"] += 1
-            
-            # Save checkpoint periodically
-            if i % self.CHECKPOINT_INTERVAL == 0:
-                self.save_results(results, f"checkpoint_{i}")
-                results = []
-                print(f"Checkpoint: processed {i}/{len(documents)} documents")
+                for i, ((doc_id, raw_url, numeric_id), (abs_url, html_content)) in enumerate(
+                        zip(batch, pages), start + 1):
+                    if not abs_url:
+                        results.append(self._create_empty_result(doc_id, raw_url))
+                        continue
+                    
+                    metadata = self.extract_metadata(html_content) if html_content else None
+                    if metadata:
+                        # Write the page in the background while the next one is parsed
+                        io_pool.submit(self.save_abstract_page, html_content, doc_id)
+                        results.append(self.create_result_row(doc_id, abs_url, metadata))
+                        stats["successful"] += 1
+                    else:
+                        results.append(self._create_empty_result(doc_id, abs_url))
+                        
+                    stats["processed"] += 1
+                    
+                    # Save checkpoint periodically
+                    if i % self.CHECKPOINT_INTERVAL == 0:
+                        writer.writerows(results)
+                        results.clear()
+                        output_file.flush()
+                        print(f"Checkpoint: processed {i}/{len(documents)} documents")
             
-            time.sleep(self.REQUEST_DELAY)
-        
-        # Save remaining results
-        if results:
-            self.save_results(results, "final")
+            # Save remaining results
+            writer.writerows(results)
             
         return stats
 
@@ -3,37 +3,92 @@ License and Version Distribution Analyzer
 Analyzes distribution patterns in ArXiv metadata extraction results.
 """
 
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+import csv
+import gc
+import json
 import re
 from collections import Counter
-from typing import Dict, Tuple, List, Any
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Tuple, List, Any, Optional
 import os
 
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    from pyarrow import csv as pa_csv
+except ImportError:
+    pa = None
+
+
+_VERSION_NUMBER_RE = re.compile(r'(\d+)')
+_WHITESPACE_RE = re.compile(r'\s+')
+# Dash-like characters, plus the \x13 an en dash decays to when its high bytes are lost
+_DASH_RE = re.compile(r'[\u2010-\u2015\x13]')
+
+
+def _version_number(version: str) -> int:
+    """Numeric part of a version label such as 'v3', or 0 if it has none."""
+    match = _VERSION_NUMBER_RE.search(version)
+    return int(match.group(1)) if match else 0
+
 
 class LicenseVersionAnalyzer:
     """Analyzes license and version distributions from ArXiv metadata."""
     
+    # Only these columns feed the distributions
+    COUNT_COLUMNS = ['license_name', 'version']
+    
+    # Variant spellings of the same license (keyed case-folded, dashes already
+    # mapped to '-'), e.g. CSVs that dropped the en dash in an encoding round-trip
+    LICENSE_ALIASES = {
+        "arxiv assumed (1991-2003)": "arXiv Assumed (1991-2003)",
+        "arxiv assumed (19912003)": "arXiv Assumed (1991-2003)",
+    }
+    
+    # Bars drawn per chart; the long tail is folded into one 'Other' bar
+    PLOT_TOP_K = 20
+    
     def __init__(self, csv_path: str = "arxiv_metadata.csv", output_dir: str = ".") -> None:
         self.csv_path = csv_path
         self.output_dir = output_dir
-        self.df = None
-        self.setup_plotting()
+        self.license_counts = None
+        self.version_counts = None
+        
+        # Sorted distributions, built once from the counts and shared by all outputs
+        self._license_distribution = None
+        self._version_distribution = None
+        
+        # Single figure reused by every plot, created on first use
+        self._fig = None
+        self._ax = None
         
         # Create output directory if it doesn't exist
         os.makedirs(self.output_dir, exist_ok=True)
     
     def setup_plotting(self) -> None:
         """Configure matplotlib for consistent styling."""
+        # Plotting libraries are imported on first use to keep module import cheap
+        import matplotlib
+        # Non-interactive backend: plots are only written to files
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+        
         plt.style.use('default')
         sns.set_palette("husl")
     
     def load_data(self) -> bool:
-        """Load and preprocess the CSV data."""
+        """Count license and version values in a single pass over the CSV."""
         try:
-            self.df = pd.read_csv(self.csv_path)
-            print(f"Loaded dataset with {len(self.df)} records")
+            if pa is not None:
+                self.license_counts, self.version_counts = self._count_with_arrow()
+            else:
+                self.license_counts, self.version_counts = self._count_with_csv()
+            self._license_distribution = self._version_distribution = None
+                
+            print(f"Loaded dataset with {sum(self.license_counts.values())} records")
             return True
         except FileNotFoundError:
             print(f"Error: File '{self.csv_path}' not found")
@@ -42,48 +97,163 @@ class LicenseVersionAnalyzer:
             print(f"Error loading data: {e}")
             return False
     
+    def _count_with_arrow(self) -> Tuple[Counter, Counter]:
+        """Count values with PyArrow, reusing a Parquet cache of the needed columns."""
+        cache_path = self.csv_path + '.lv.parquet'
+        meta_path = cache_path + '.meta.json'
+        csv_stat = os.stat(self.csv_path)
+        cache_key = [csv_stat.st_mtime_ns, csv_stat.st_size]
+        
+        table = None
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                if json.load(f).get('key') == cache_key:
+                    table = pq.read_table(cache_path, columns=self.COUNT_COLUMNS,
+                                          use_threads=True)
+        except (OSError, ValueError):
+            # Missing or unreadable cache; fall through to parsing the CSV
+            pass
+        
+        if table is None:
+            table = self._read_csv_with_arrow()
+            try:
+                pq.write_table(table, cache_path)
+                with open(meta_path, 'w', encoding='utf-8') as f:
+                    json.dump({'key': cache_key}, f)
+            except OSError as e:
+                print(f"Warning: could not write cache '{cache_path}': {e}")
+        
+        counts = []
+        for name in self.COUNT_COLUMNS:
+            # One unified dictionary lets value_counts hash each chunk's indices directly
+            value_counts = pc.value_counts(table.column(name).combine_chunks())
+            counts.append(Counter(dict(zip(value_counts.field('values').to_pylist(),
+                                           value_counts.field('counts').to_pylist()))))
+        return counts[0], counts[1]
+    
+    def _read_csv_with_arrow(self) -> "pa.Table":
+        """Parse only the counted columns with PyArrow's C++ CSV reader."""
+        # Dictionary-encoded columns hold each distinct string once
+        column_types = {name: pa.dictionary(pa.int32(), pa.string()) for name in self.COUNT_COLUMNS}
+        
+        # Blocks are parsed in parallel, so give every core at least one (1-64 MiB each)
+        per_core = os.path.getsize(self.csv_path) // (os.cpu_count() or 1) + 1
+        block_size = min(1 << 26, max(1 << 20, per_core))
+        
+        return pa_csv.read_csv(
+            self.csv_path,
+            read_options=pa_csv.ReadOptions(use_threads=True, block_size=block_size),
+            # Titles and comments may span lines inside quoted cells; ragged rows
+            # are skipped, as in the csv fallback, instead of failing the load
+            parse_options=pa_csv.ParseOptions(
+                newlines_in_values=True,
+                invalid_row_handler=lambda row: 'skip',
+            ),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=self.COUNT_COLUMNS,
+                column_types=column_types,
+            ),
+        )
+    
+    def _count_with_csv(self) -> Tuple[Counter, Counter]:
+        """Count values with the stdlib csv module when PyArrow is unavailable."""
+        with open(self.csv_path, newline='', encoding='utf-8', buffering=1 << 20) as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            license_index = header.index('license_name')
+            version_index = header.index('version')
+            min_row_length = max(license_index, version_index) + 1
+            
+            # Counter.update tallies the (license, version) pairs in C; blank
+            # lines and short rows are skipped, matching the PyArrow reader's
+            # invalid_row_handler
+            pair_counts = Counter()
+            pair_counts.update(
+                (row[license_index], row[version_index])
+                for row in reader if len(row) >= min_row_length
+            )
+        
+        license_counts = Counter()
+        version_counts = Counter()
+        for (license_name, version), count in pair_counts.items():
+            license_counts[license_name] += count
+            version_counts[version] += count
+        return license_counts, version_counts
+    
     def preprocess_data(self) -> None:
         """Clean and prepare data for analysis."""
-        if self.df is None:
+        if self.license_counts is None:
             return
-            
-        # Clean license names
-        self.df['license_name'] = self.df['license_name'].fillna('Unknown')
-        self.df['license_name'] = self.df['license_name'].replace('', 'Unknown')
         
-        # Clean version data
-        self.df['version'] = self.df['version'].fillna('Unknown')
-        self.df['version'] = self.df['version'].replace('', 'Unknown')
+        # Collapse spelling variants so each license is counted in one bucket
+        self.license_counts = self._normalize_license_counts(self.license_counts)
+        
+        # Fold empty license names and versions into 'Unknown'
+        self._merge_empty_into_unknown(self.license_counts)
+        self._merge_empty_into_unknown(self.version_counts)
+        
+        # Sort both distributions once; every getter, plot and report reuses them
+        self._license_distribution = dict(self.license_counts.most_common())
+        self._version_distribution = self._sort_versions(self.version_counts)
+    
+    def _normalize_license_counts(self, counts: Counter) -> Counter:
+        """Merge counts whose names differ only in case, whitespace or dashes.
+        
+        Each group is labelled with its alias, if any, else its most frequent spelling.
+        """
+        # Works on the distinct names only, not on every row
+        spellings_by_key: Dict[str, Counter] = {}
+        for license_name, count in counts.items():
+            name = _WHITESPACE_RE.sub(' ', _DASH_RE.sub('-', license_name)).strip()
+            spellings_by_key.setdefault(name.casefold(), Counter())[name] += count
+        
+        normalized = Counter()
+        for key, spellings in spellings_by_key.items():
+            label = self.LICENSE_ALIASES.get(key) or spellings.most_common(1)[0][0]
+            normalized[label] += sum(spellings.values())
+        return normalized
+    
+    def _merge_empty_into_unknown(self, counts: Counter) -> None:
+        """Move the '' bucket's count onto 'Unknown'."""
+        empty_count = counts.pop('', 0)
+        if empty_count:
+            counts['Unknown'] += empty_count
+    
+    def _sort_versions(self, counts: Counter) -> Dict[str, int]:
+        """Order version counts numerically; the sort is stable, so ties keep count order."""
+        version_counts = counts.most_common()
+        version_counts.sort(key=lambda item: _version_number(item[0]))
+        return dict(version_counts)
     
     def get_license_distribution(self) -> Dict[str, int]:
-        """Calculate license type distribution."""
-        if self.df is None:
+        """License type distribution, most common first."""
+        if self.license_counts is None:
             return {}
         
-        license_counts = self.df['license_name'].value_counts().to_dict()
-        return dict(sorted(license_counts.items(), key=lambda x: x[1], reverse=True))
+        if self._license_distribution is None:
+            self._license_distribution = dict(self.license_counts.most_common())
+        return self._license_distribution
     
     def get_version_distribution(self) -> Dict[str, int]:
-        """Calculate version distribution."""
-        if self.df is None:
+        """Version distribution in numeric version order."""
+        if self.version_counts is None:
             return {}
         
-        version_counts = self.df['version'].value_counts().to_dict()
-        # Sort versions numerically
-        return dict(sorted(version_counts.items(), 
-                         key=lambda x: int(re.search(r'(\d+)', x[0]).group(1)) if re.search(r'(\d+)', x[0]) else 0))
+        if self._version_distribution is None:
+            self._version_distribution = self._sort_versions(self.version_counts)
+        return self._version_distribution
     
     def generate_summary_statistics(self) -> Dict[str, Any]:
         """Generate comprehensive summary statistics."""
-        if self.df is None:
+        if self.license_counts is None:
             return {}
         
-        total_records = len(self.df)
-        valid_licenses = len(self.df[self.df['license_name'] != 'Unknown'])
-        valid_versions = len(self.df[self.df['version'] != 'Unknown'])
+        total_records = sum(self.license_counts.values())
+        valid_licenses = total_records - self.license_counts.get('Unknown', 0)
+        valid_versions = total_records - self.version_counts.get('Unknown', 0)
         
         # Most common licenses
-        top_licenses = self.df['license_name'].value_counts().head(5).to_dict()
+        top_licenses = dict(islice(self.get_license_distribution().items(), 5))
         
         return {
             'total_records': total_records,
@@ -94,87 +264,143 @@ class LicenseVersionAnalyzer:
             'top_licenses': top_licenses,
         }
     
-    def plot_license_distribution(self, save_path: str = None) -> None:
-        """Create clean license distribution bar plot."""
-        if self.df is None:
+    def _get_axes(self, figsize: Tuple[float, float]):
+        """Return the shared plot Axes, cleared and resized for the next chart."""
+        import matplotlib.pyplot as plt
+        
+        if self._fig is None:
+            self.setup_plotting()
+            self._fig, self._ax = plt.subplots(figsize=figsize)
+        else:
+            self._ax.clear()
+            self._fig.set_size_inches(figsize)
+        return self._ax
+    
+    def close_plots(self) -> None:
+        """Close the shared figure and reclaim its memory."""
+        import matplotlib.pyplot as plt
+        
+        if self._fig is not None:
+            plt.close(self._fig)
+            self._fig = self._ax = None
+            gc.collect()
+    
+    def _save_figure(self, save_path: str) -> str:
+        """Save the shared figure under output_dir, in the format named by its extension."""
+        full_path = os.path.join(self.output_dir, save_path)
+        # The figure is pre-sized and laid out, so skip bbox_inches='tight' and its
+        # extra measuring render; dpi only matters for raster formats
+        if full_path.lower().endswith(('.png', '.jpg', '.jpeg')):
+            self._fig.savefig(full_path, dpi=300)
+        else:
+            self._fig.savefig(full_path)
+        return full_path
+    
+    def _fold_tail(self, data: Dict[str, int]) -> Dict[str, int]:
+        """Keep the first PLOT_TOP_K entries and sum the rest into an 'Other' entry."""
+        if len(data) <= self.PLOT_TOP_K:
+            return data
+        
+        items = list(data.items())
+        plotted = dict(items[:self.PLOT_TOP_K])
+        plotted['Other'] = sum(count for _, count in items[self.PLOT_TOP_K:])
+        return plotted
+    
+    def plot_license_distribution(self, save_path: str = None,
+                                  license_data: Optional[Dict[str, int]] = None) -> None:
+        """Create clean license distribution bar plot, optionally from precomputed counts."""
+        if self.license_counts is None:
             return
         
-        license_data = self.get_license_distribution()
+        if license_data is None:
+            license_data = self.get_license_distribution()
         
-        plt.figure(figsize=(12, 6))
+        # Licenses are sorted by count, so this keeps the most common ones
+        license_data = self._fold_tail(license_data)
+        
+        ax = self._get_axes((max(12, 0.6 * len(license_data)), 6))
         
         licenses = list(license_data.keys())
         counts = list(license_data.values())
         
-        bars = plt.bar(range(len(licenses)), counts, color='skyblue', edgecolor='black')
-        plt.title('License Type Distribution', fontsize=16, fontweight='bold', pad=20)
-        plt.xlabel('License Type', fontsize=12)
-        plt.ylabel('Number of Papers', fontsize=12)
+        bars = ax.bar(range(len(licenses)), counts, color='skyblue', edgecolor='black')
+        ax.set_title('License Type Distribution', fontsize=16, fontweight='bold', pad=20)
+        ax.set_xlabel('License Type', fontsize=12)
+        ax.set_ylabel('Number of Papers', fontsize=12)
         
         # Set x-axis labels with rotation to prevent overlap
-        plt.xticks(range(len(licenses)), licenses, rotation=45, ha='right')
+        ax.set_xticks(range(len(licenses)), licenses, rotation=45, ha='right')
         
         # Add value labels on bars
         for bar, count in zip(bars, counts):
             height = bar.get_height()
-            plt.text(bar.get_x() + bar.get_width()/2., height + 0.1,
+            ax.text(bar.get_x() + bar.get_width()/2., height + 0.1,
                     f'{count}', ha='center', va='bottom', fontweight='bold')
         
-        plt.grid(axis='y', alpha=0.3)
-        plt.tight_layout()
+        ax.grid(axis='y', alpha=0.3)
+        self._fig.tight_layout()
         
         if save_path:
-            full_path = os.path.join(self.output_dir, save_path)
-            plt.savefig(full_path, dpi=300, bbox_inches='tight')
+            full_path = self._save_figure(save_path)
             print(f"License distribution plot saved to: {full_path}")
-        
-        plt.show()
     
-    def plot_version_distribution(self, save_path: str = None) -> None:
-        """Create clean version distribution bar plot."""
-        if self.df is None:
+    def plot_version_distribution(self, save_path: str = None,
+                                  version_data: Optional[Dict[str, int]] = None) -> None:
+        """Create clean version distribution bar plot, optionally from precomputed counts."""
+        if self.license_counts is None:
             return
         
-        version_data = self.get_version_distribution()
+        if version_data is None:
+            version_data = self.get_version_distribution()
         
         # Filter out 'Unknown' for cleaner visualization
         filtered_versions = {k: v for k, v in version_data.items() if k != 'Unknown'}
+        # Versions are in numeric order, so the rare high versions are folded
+        filtered_versions = self._fold_tail(filtered_versions)
         
-        plt.figure(figsize=(10, 6))
+        ax = self._get_axes((max(10, 0.6 * len(filtered_versions)), 6))
         
         versions = list(filtered_versions.keys())
         counts = list(filtered_versions.values())
         
-        bars = plt.bar(range(len(versions)), counts, color='lightcoral', edgecolor='black')
-        plt.title('Version Distribution', fontsize=16, fontweight='bold', pad=20)
-        plt.xlabel('Version', fontsize=12)
-        plt.ylabel('Number of Papers', fontsize=12)
-        plt.xticks(range(len(versions)), versions)
+        bars = ax.bar(range(len(versions)), counts, color='lightcoral', edgecolor='black')
+        ax.set_title('Version Distribution', fontsize=16, fontweight='bold', pad=20)
+        ax.set_xlabel('Version', fontsize=12)
+        ax.set_ylabel('Number of Papers', fontsize=12)
+        ax.set_xticks(range(len(versions)), versions)
         
         # Add value labels on bars
         for bar, count in zip(bars, counts):
             height = bar.get_height()
-            plt.text(bar.get_x() + bar.get_width()/2., height + 0.1,
+            ax.text(bar.get_x() + bar.get_width()/2., height + 0.1,
                     f'{count}', ha='center', va='bottom', fontweight='bold')
         
-        plt.grid(axis='y', alpha=0.3)
-        plt.tight_layout()
+        ax.grid(axis='y', alpha=0.3)
+        self._fig.tight_layout()
         
         if save_path:
-            full_path = os.path.join(self.output_dir, save_path)
-            plt.savefig(full_path, dpi=300, bbox_inches='tight')
+            full_path = self._save_figure(save_path)
             print(f"Version distribution plot saved to: {full_path}")
-        
-        plt.show()
     
-    def generate_report(self, report_name: str = "analysis_report.txt") -> None:
-        """Generate a comprehensive text report."""
-        if self.df is None:
+    def _format_counts(self, counts: Dict[str, int], total: int) -> str:
+        """Render 'name: count (pct%)' report lines as one string."""
+        return "".join(f"{name}: {count:,} ({count / total * 100:.1f}%)\n"
+                       for name, count in counts.items())
+    
+    def generate_report(self, report_name: str = "analysis_report.txt",
+                        summary: Optional[Dict[str, Any]] = None,
+                        license_dist: Optional[Dict[str, int]] = None,
+                        version_dist: Optional[Dict[str, int]] = None) -> None:
+        """Generate a comprehensive text report, optionally from precomputed results."""
+        if self.license_counts is None:
             return
         
-        summary = self.generate_summary_statistics()
-        license_dist = self.get_license_distribution()
-        version_dist = self.get_version_distribution()
+        if summary is None:
+            summary = self.generate_summary_statistics()
+        if license_dist is None:
+            license_dist = self.get_license_distribution()
+        if version_dist is None:
+            version_dist = self.get_version_distribution()
         
         report_path = os.path.join(self.output_dir, report_name)
         
@@ -192,23 +418,17 @@ class LicenseVersionAnalyzer:
             
             f.write("TOP 5 LICENSES:\n")
             f.write("-" * 15 + "\n")
-            for license_name, count in summary['top_licenses'].items():
-                percentage = (count / summary['total_records']) * 100
-                f.write(f"{license_name}: {count:,} ({percentage:.1f}%)\n")
+            f.write(self._format_counts(summary['top_licenses'], summary['total_records']))
             
             f.write("\nDETAILED LICENSE DISTRIBUTION:\n")
             f.write("-" * 30 + "\n")
-            for license_name, count in license_dist.items():
-                percentage = (count / summary['total_records']) * 100
-                f.write(f"{license_name}: {count:,} ({percentage:.1f}%)\n")
+            f.write(self._format_counts(license_dist, summary['total_records']))
             
             f.write("\nVERSION DISTRIBUTION:\n")
             f.write("-" * 20 + "\n")
-            for version, count in version_dist.items():
-                percentage = (count / summary['total_records']) * 100
-                f.write(f"{version}: {count:,} ({percentage:.1f}%)\n")
+            f.write(self._format_counts(version_dist, summary['total_records']))
             
-            f.write(f"\nReport generated on: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write(f"\nReport generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
         
         print(f"Comprehensive report saved to: {report_path}")
     
@@ -219,25 +439,30 @@ class LicenseVersionAnalyzer:
         
         self.preprocess_data()
         
-        # Generate plots
-        self.plot_license_distribution("license_distribution.png")
-        self.plot_version_distribution("version_distribution.png")
-        
-        # Generate comprehensive report
-        self.generate_report("analysis_report.txt")
-        
-        # Print summary to console
+        # Compute every distribution once and share it with all outputs
         summary = self.generate_summary_statistics()
         license_dist = self.get_license_distribution()
+        version_dist = self.get_version_distribution()
         
-        print("\n" + "="*50)
-        print("ANALYSIS COMPLETED")
-        print("="*50)
-        print(f"Total records: {summary['total_records']:,}")
-        print(f"License coverage: {summary['license_coverage']:.1f}%")
-        print(f"Version coverage: {summary['version_coverage']:.1f}%")
-        print(f"Most common license: {list(summary['top_licenses'].keys())[0]}")
-        print(f"\nOutput files saved to: {self.output_dir}")
+        # Generate plots
+        self.plot_license_distribution("license_distribution.svg", license_dist)
+        self.plot_version_distribution("version_distribution.svg", version_dist)
+        self.close_plots()
+        
+        # Generate comprehensive report
+        self.generate_report("analysis_report.txt", summary, license_dist, version_dist)
+        
+        # Print summary to console in a single write
+        print("\n".join([
+            "\n" + "="*50,
+            "ANALYSIS COMPLETED",
+            "="*50,
+            f"Total records: {summary['total_records']:,}",
+            f"License coverage: {summary['license_coverage']:.1f}%",
+            f"Version coverage: {summary['version_coverage']:.1f}%",
+            f"Most common license: {list(summary['top_licenses'].keys())[0]}",
+            f"\nOutput files saved to: {self.output_dir}",
+        ]))
 
 
 def main():